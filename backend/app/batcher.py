@@ -0,0 +1,207 @@
+"""
+batcher.py
+
+Micro-batching queue in front of the Embedder.
+
+A single-sample CLIP forward is dominated by reading the model weights, so the
+accelerator sits mostly idle between requests. Instead of embedding each request
+on its own, we:
+- park every request in an asyncio.Queue together with a Future
+- let a background task drain the queue for a few milliseconds (or until the batch is full)
+- run ONE batched forward pass and hand each row of the output back to its Future
+
+Text and image requests use separate queues because they go through different towers.
+Forward passes run on a dedicated thread pool so the event loop stays responsive, and a
+semaphore bounds how many batches run at once (1 on a GPU, to avoid context thrash).
+"""
+
+from __future__ import annotations
+
+import asyncio
+from concurrent.futures import Executor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.embeddings import Embedder, InvalidPayloadError
+
+
+class MicroBatcher:
+    """
+    Coalesces concurrent embedding requests into batched forward passes.
+
+    Usage (inside an async endpoint):
+        vector = await batcher.enqueue("text", "a dog on a beach")
+        vector = await batcher.enqueue("image", "data/images/dog.jpg")
+
+    A per-kind sink, e.g. {"image": lambda paths, vectors: store.add_many(paths, vectors)},
+    receives every embedded batch as a whole before its callers are woken up, so
+    downstream work like indexing stays batched too.
+    """
+
+    def __init__(
+        self,
+        embedder: Embedder,
+        max_batch_size: int = 32,
+        max_wait_s: float = 0.01,
+        executor: Optional[Executor] = None,
+        max_concurrent_batches: int = 1,
+        sinks: Optional[Dict[str, Callable[[List[Any], np.ndarray], None]]] = None,
+        sink_executor: Optional[Executor] = None,
+    ) -> None:
+        self.max_batch_size = max_batch_size
+        self.max_wait_s = max_wait_s
+        self.max_concurrent_batches = max_concurrent_batches
+
+        # Thread pool that runs the blocking forward passes (None = the loop's default pool)
+        self._executor = executor
+
+        # Batched embedding function for each request kind
+        self._embed_fns: Dict[str, Callable[[List[Any]], np.ndarray]] = {
+            "text": embedder.embed_texts,
+            "image": embedder.embed_images,
+        }
+
+        # Called with (payloads, vectors) per embedded batch, on `sink_executor` (blocking I/O)
+        self._sinks = sinks or {}
+        self._sink_executor = sink_executor
+
+        # Kinds whose forward passes run on the local model and so take a slot from `_slots`.
+        # Remote text embedding (an HTTP call) must not hold the device slot image batches need.
+        self._local_kinds = {"image"} if embedder.remote_text else {"text", "image"}
+
+        # Queues + worker tasks are created lazily: they must belong to the running event loop
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queues: Dict[str, asyncio.Queue[Tuple[Any, asyncio.Future]]] = {}
+        self._workers: Dict[str, asyncio.Task] = {}
+        # Bounds concurrent forward passes across both queues
+        self._slots: Optional[asyncio.Semaphore] = None
+
+    async def enqueue(self, kind: str, payload: Any) -> np.ndarray:
+        """
+        Submit one text query / image path and wait for its embedding.
+
+        Args:
+            kind: "text" or "image"
+            payload: the query string or the image path
+
+        Returns:
+            The embedding vector for this payload (a row of the batch's float32 output).
+        """
+        if kind not in self._embed_fns:
+            raise ValueError(f"unknown embedding kind: {kind}")
+
+        loop = asyncio.get_running_loop()
+        future: asyncio.Future = loop.create_future()
+
+        await self._queue_for(kind).put((payload, future))
+        return await future
+
+    def _queue_for(self, kind: str) -> asyncio.Queue:
+        """Return the queue for `kind`, starting its worker task on first use."""
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            # A new event loop (e.g. test client, server reload) can't use the old loop's queues
+            self._loop = loop
+            self._queues = {}
+            self._workers = {}
+            self._slots = asyncio.Semaphore(self.max_concurrent_batches)
+
+        queue = self._queues.get(kind)
+        if queue is None:
+            queue = asyncio.Queue()
+            self._queues[kind] = queue
+            self._workers[kind] = asyncio.create_task(self._worker(kind, queue))
+        return queue
+
+    async def _worker(self, kind: str, queue: asyncio.Queue) -> None:
+        """Forever: collect a batch, embed it once, scatter the rows back to the callers."""
+        while True:
+            batch = await self._collect_batch(queue)
+
+            # Callers that gave up (e.g. client disconnected) don't need a forward pass
+            batch = [(payload, future) for payload, future in batch if not future.done()]
+            if not batch:
+                continue
+
+            await self._embed_batch(kind, batch)
+
+    async def _embed_batch(self, kind: str, batch: List[Tuple[Any, asyncio.Future]]) -> None:
+        """
+        Embed one batch and deliver it. An InvalidPayloadError fails only the payload it
+        points at; any other exception fails the whole batch at once.
+        """
+        while batch:
+            try:
+                vectors = await self._embed(kind, [payload for payload, _ in batch])
+            except InvalidPayloadError as exc:
+                # One bad payload (e.g. a file PIL can't read) must not fail the requests
+                # batched with it: fail just that one and embed the rest again
+                _, future = batch.pop(exc.index)
+                self._fail(future, exc)
+                continue
+            except Exception as exc:
+                # Not caused by a single payload (model load, OOM, sidecar timeout): retrying
+                # item by item would only repeat the failure, so fail everyone now
+                for _, future in batch:
+                    self._fail(future, exc)
+                return
+
+            await self._deliver(kind, batch, vectors)
+            return
+
+    async def _embed(self, kind: str, payloads: List[Any]) -> np.ndarray:
+        """Run one batched forward pass on the executor, within the concurrency limit."""
+        assert self._slots is not None
+        loop = asyncio.get_running_loop()
+        embed_fn = self._embed_fns[kind]
+
+        # The forward pass is blocking; keep it off the event loop
+        if kind not in self._local_kinds:
+            return await loop.run_in_executor(self._executor, embed_fn, payloads)
+        async with self._slots:
+            return await loop.run_in_executor(self._executor, embed_fn, payloads)
+
+    async def _deliver(self, kind: str, batch: List[Tuple[Any, asyncio.Future]], vectors: np.ndarray) -> None:
+        """Hand the batch to its sink (if any), then scatter the rows back to the callers."""
+        sink = self._sinks.get(kind)
+        if sink is not None:
+            loop = asyncio.get_running_loop()
+            try:
+                await loop.run_in_executor(
+                    self._sink_executor, sink, [payload for payload, _ in batch], vectors
+                )
+            except Exception as exc:
+                for _, future in batch:
+                    self._fail(future, exc)
+                return
+
+        for (_, future), vector in zip(batch, vectors):
+            if not future.done():
+                future.set_result(vector)
+
+    @staticmethod
+    def _fail(future: asyncio.Future, exc: BaseException) -> None:
+        if not future.done():
+            future.set_exception(exc)
+
+    async def _collect_batch(self, queue: asyncio.Queue) -> List[Tuple[Any, asyncio.Future]]:
+        """
+        Block for the first item, then keep collecting until the batch is full
+        or `max_wait_s` has elapsed since the first item arrived.
+        """
+        loop = asyncio.get_running_loop()
+
+        batch = [await queue.get()]
+        deadline = loop.time() + self.max_wait_s
+
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(queue.get(), timeout=timeout))
+            except asyncio.TimeoutError:
+                break
+
+        return batch
@@ -0,0 +1,98 @@
+"""
+export_onnx.py
+
+One-off export of the CLIP text + image towers to ONNX, for Embedder's "onnx" backend.
+
+Usage (from backend/, with `pip install onnx`; torch's exporter needs it, serving doesn't):
+    python -m app.export_onnx            # writes to EmbedderConfig's default onnx_*_path
+
+Both graphs have dynamic batch axes (and a dynamic sequence axis for text), so the
+same files serve single requests and micro-batches.
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+
+import torch
+from transformers import CLIPModel, CLIPProcessor
+
+from app.embeddings import EmbedderConfig
+
+
+class _TextTower(torch.nn.Module):
+    """Exposes CLIPModel.get_text_features as a plain forward() for the exporter."""
+
+    def __init__(self, model: CLIPModel) -> None:
+        super().__init__()
+        self.model = model
+
+    def forward(self, input_ids: torch.Tensor, attention_mask: torch.Tensor) -> torch.Tensor:
+        return self.model.get_text_features(input_ids=input_ids, attention_mask=attention_mask)
+
+
+class _ImageTower(torch.nn.Module):
+    """Exposes CLIPModel.get_image_features as a plain forward() for the exporter."""
+
+    def __init__(self, model: CLIPModel) -> None:
+        super().__init__()
+        self.model = model
+
+    def forward(self, pixel_values: torch.Tensor) -> torch.Tensor:
+        return self.model.get_image_features(pixel_values=pixel_values)
+
+
+def export(model_name: str, text_path: str, image_path: str) -> None:
+    processor = CLIPProcessor.from_pretrained(model_name)
+    model = CLIPModel.from_pretrained(model_name).eval()
+
+    text_inputs = processor(text=["a photo of a dog"], return_tensors="pt", padding=True)
+    size = model.config.vision_config.image_size
+    pixel_values = torch.zeros(1, 3, size, size)
+
+    for path in (text_path, image_path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+    with torch.no_grad():
+        torch.onnx.export(
+            _TextTower(model),
+            (text_inputs["input_ids"], text_inputs["attention_mask"]),
+            text_path,
+            input_names=["input_ids", "attention_mask"],
+            output_names=["text_embeds"],
+            dynamic_axes={
+                "input_ids": {0: "batch", 1: "sequence"},
+                "attention_mask": {0: "batch", 1: "sequence"},
+                "text_embeds": {0: "batch"},
+            },
+            opset_version=17,
+            dynamo=False,
+        )
+        torch.onnx.export(
+            _ImageTower(model),
+            (pixel_values,),
+            image_path,
+            input_names=["pixel_values"],
+            output_names=["image_embeds"],
+            dynamic_axes={"pixel_values": {0: "batch"}, "image_embeds": {0: "batch"}},
+            opset_version=17,
+            dynamo=False,
+        )
+
+
+def main() -> None:
+    defaults = EmbedderConfig()
+
+    parser = argparse.ArgumentParser(description="Export CLIP text/image towers to ONNX.")
+    parser.add_argument("--model-name", default=defaults.model_name)
+    parser.add_argument("--text-path", default=defaults.onnx_text_path)
+    parser.add_argument("--image-path", default=defaults.onnx_image_path)
+    args = parser.parse_args()
+
+    export(args.model_name, args.text_path, args.image_path)
+    print(f"wrote {args.text_path} and {args.image_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,7 +3,7 @@ VisionQuery API (FastAPI)
 
 This module is the orchestration layer for the backend:
 - Exposes HTTP endpoints (/health, /ingest/image, /search, /metrics)
-- Delegates embedding work to app.embeddings.Embedder
+- Delegates embedding work to app.embeddings.Embedder (through app.batcher.MicroBatcher)
 - Stores/searches vectors via app.vector_store.VectorStore
 
 Key production detail:
@@ -13,17 +13,22 @@ Key production detail:
 
 from __future__ import annotations
 
+import asyncio
 import os
 import time
-from typing import Any, Dict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List
 
+import numpy as np
 from fastapi import FastAPI, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 from prometheus_client import CONTENT_TYPE_LATEST, Counter, Histogram, generate_latest
 
 # Local modules that handle embeddings and vector search logic
-from app.embeddings import Embedder
-from app.vector_store import VectorStore
+from app.batcher import MicroBatcher
+from app.embeddings import Embedder, EmbedderConfig
+from app.semantic_cache import SemanticCache
+from app.vector_store import SearchResult, VectorStore, VectorStoreConfig
 
 
 # -----------------------------
@@ -43,6 +48,13 @@ REQUEST_LATENCY = Histogram(
     ["endpoint"],
 )
 
+# Semantic cache lookups on /search, labelled hit/miss (hit ratio = hit / total)
+SEMANTIC_CACHE_LOOKUPS = Counter(
+    "semantic_cache_lookups_total",
+    "Semantic cache lookups on /search",
+    ["result"],
+)
+
 
 # -----------------------------
 # App setup
@@ -66,11 +78,68 @@ app.add_middleware(
 
 # The Embedder is responsible for turning images/text into vectors.
 # It should not block server startup (model is lazy-loaded inside Embedder).
-embedder = Embedder()
+# EMBED_BACKEND=onnx serves the exported ONNX graphs through ONNX Runtime instead of PyTorch.
+# EMBED_TEXT_URL offloads query embedding to a sidecar with a TEI-style /embed API (images stay
+# in-process); it is checked against the local text tower first unless EMBED_TEXT_VERIFY=0.
+# EMBED_COMPILE=1 (torch.compile), EMBED_CUDA_GRAPHS=1 (batch-1 CUDA graphs, GPU) and
+# EMBED_QUANTIZE_TEXT_INT8=1 (INT8 text tower, CPU) switch on the optional model optimizations.
+embedder = Embedder(
+    EmbedderConfig(
+        backend=os.getenv("EMBED_BACKEND", "torch"),
+        remote_text_url=os.getenv("EMBED_TEXT_URL") or None,
+        remote_verify=os.getenv("EMBED_TEXT_VERIFY", "1") == "1",
+        compile_model=os.getenv("EMBED_COMPILE") == "1",
+        cuda_graphs=os.getenv("EMBED_CUDA_GRAPHS") == "1",
+        quantize_text_int8=os.getenv("EMBED_QUANTIZE_TEXT_INT8") == "1",
+    )
+)
+
+# Dedicated threads for the blocking forward passes, so the event loop never waits on the model.
+EMBED_WORKERS = int(os.getenv("EMBED_WORKERS", "2"))
+EXECUTOR = ThreadPoolExecutor(max_workers=EMBED_WORKERS, thread_name_prefix="embed")
+
+# Separate threads for vector store + semantic cache work (scans, HNSW inserts, file appends),
+# so it neither blocks the event loop nor queues behind model forwards on EXECUTOR.
+STORE_WORKERS = int(os.getenv("STORE_WORKERS", "4"))
+STORE_EXECUTOR = ThreadPoolExecutor(max_workers=STORE_WORKERS, thread_name_prefix="store")
+
+# Concurrent requests are coalesced into batched forward passes (one per ~10 ms window).
+# The batcher runs one serial worker per kind (text, image), so at most two batches can ever
+# overlap: on CPU a text and an image batch may run side by side (if EMBED_WORKERS >= 2),
+# on a GPU only one batch runs at a time.
+# Each embedded image batch goes into the store with one add_many call (_index_images, below).
+batcher = MicroBatcher(
+    embedder,
+    executor=EXECUTOR,
+    max_concurrent_batches=1 if embedder.device == "cuda" else min(EMBED_WORKERS, 2),
+    sinks={"image": lambda paths, vectors: _index_images(paths, vectors)},
+    sink_executor=STORE_EXECUTOR,
+)
 
 # In-memory vector store for similarity search.
-# This can be swapped for FAISS / pgvector / a managed vector DB later.
-store = VectorStore()
+# VECTOR_INDEX=hnsw switches from the exact flat scan to a FAISS HNSW graph;
+# VECTOR_DATA_DIR keeps vectors in memory-mapped files there, so the index survives restarts;
+# VECTOR_INDEX_PATH makes the HNSW index survive restarts (saved on shutdown);
+# VECTOR_QUANTIZATION=int8 stores rows as int8 + per-row scale (4x less memory traffic).
+store = VectorStore(
+    VectorStoreConfig(
+        index_type=os.getenv("VECTOR_INDEX", "flat"),
+        index_path=os.getenv("VECTOR_INDEX_PATH") or None,
+        data_dir=os.getenv("VECTOR_DATA_DIR") or None,
+        quantization=os.getenv("VECTOR_QUANTIZATION", "none"),
+    )
+)
+
+
+# Near-duplicate queries (cosine >= 0.97 in CLIP space) reuse earlier /search results.
+# Cleared on every ingest, since new images can change any ranking.
+cache = SemanticCache()
+
+
+@app.on_event("shutdown")
+def persist_index() -> None:
+    """Flush persisted vectors and write the HNSW index (no-op for a purely in-memory store)."""
+    store.save()
 
 
 # -----------------------------
@@ -116,7 +185,7 @@ def metrics() -> Response:
 
 
 @app.post("/ingest/image")
-def ingest_image(payload: Dict[str, Any]) -> Dict[str, Any]:
+async def ingest_image(payload: Dict[str, Any]) -> Dict[str, Any]:
     """
     Ingest an image by:
       1) Validating the path exists
@@ -135,14 +204,14 @@ def ingest_image(payload: Dict[str, Any]) -> Dict[str, Any]:
     if not os.path.exists(image_path):
         return {"error": f"image path not found: {image_path}"}
 
-    vector = embedder.embed_image(image_path)
-    store.add(vector, {"path": image_path})
+    # Embeds the image and adds it to the store, batched with concurrent ingests
+    await batcher.enqueue("image", image_path)
 
     return {"status": "indexed", "path": image_path}
 
 
 @app.post("/search")
-def search(payload: Dict[str, Any]) -> Dict[str, Any]:
+async def search(payload: Dict[str, Any]) -> Dict[str, Any]:
     """
     Semantic search over indexed images using a text query.
 
@@ -155,9 +224,32 @@ def search(payload: Dict[str, Any]) -> Dict[str, Any]:
     if not query:
         return {"error": "query text required"}
 
-    query_vector = embedder.embed_text(query)
-    results = store.search(query_vector, top_k=top_k)
+    query_vector = await batcher.enqueue("text", query)
+    results = await asyncio.get_running_loop().run_in_executor(
+        STORE_EXECUTOR, _search_index, query_vector, top_k
+    )
 
     return {
-        "results": [{"path": meta["path"], "score": float(score)} for score, meta in results]
-    }
\ No newline at end of file
+        "results": [{"path": r.path, "score": r.score} for r in results]
+    }
+
+
+# -----------------------------
+# Blocking store/cache work (runs on STORE_EXECUTOR)
+# -----------------------------
+def _index_images(image_paths: List[str], vectors: np.ndarray) -> None:
+    store.add_many(image_paths, vectors)
+    cache.clear()
+
+
+def _search_index(query_vector: np.ndarray, top_k: int) -> List[SearchResult]:
+    results = cache.get(query_vector, top_k)
+    if results is not None:
+        SEMANTIC_CACHE_LOOKUPS.labels("hit").inc()
+        return results
+
+    SEMANTIC_CACHE_LOOKUPS.labels("miss").inc()
+    generation = cache.generation
+    results = store.search(query_vector, top_k=top_k)
+    cache.put(query_vector, top_k, results, generation=generation)
+    return results
@@ -0,0 +1,118 @@
+"""
+semantic_cache.py
+
+Bounded LRU cache for /search results, keyed by *similar* query embeddings.
+
+Near-duplicate queries ("a red car" vs "red car photo") land very close together in
+CLIP space, so if a new query embedding has cosine similarity >= threshold with a cached
+one, we return the cached results and skip the vector scan entirely.
+
+Cached query embeddings live in a (max_entries, D) float32 buffer, so a lookup is one
+matmul, like VectorStore's flat search. Slots stay dense in [0, n): an evicted entry's slot
+is reused by the entry that replaced it.
+"""
+
+from __future__ import annotations
+
+from collections import OrderedDict
+from threading import Lock
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from app.vector_store import SearchResult
+
+
+class SemanticCache:
+    def __init__(self, max_entries: int = 10_000, threshold: float = 0.97) -> None:
+        self.max_entries = max_entries
+        self.threshold = threshold
+
+        # Normalized query embeddings; row i belongs to slot i
+        self._embs: np.ndarray | None = None
+        # slot -> (top_k the results were computed for, results), in LRU order (oldest first)
+        self._entries: OrderedDict[int, Tuple[int, List[SearchResult]]] = OrderedDict()
+
+        # Bumped by clear(); lets put() drop results computed against an outdated index
+        self._generation = 0
+        self._lock = Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def generation(self) -> int:
+        return self._generation
+
+    @staticmethod
+    def _normalize(v: np.ndarray) -> np.ndarray:
+        v = np.ascontiguousarray(v, dtype=np.float32).reshape(-1)
+        norm = np.float32(np.sqrt(v @ v))
+        return v / norm if norm > 0 else v
+
+    def _nearest(self, q: np.ndarray) -> Tuple[int, float]:
+        """Most similar cached slot and its cosine similarity (caller holds the lock)."""
+        n = len(self._entries)
+        if self._embs is None or n == 0:
+            return -1, -1.0
+
+        scores = self._embs[:n] @ q
+        slot = int(np.argmax(scores))
+        return slot, float(scores[slot])
+
+    def get(self, query_embedding: np.ndarray, top_k: int) -> Optional[List[SearchResult]]:
+        """Return cached results for a similar enough query, or None on a miss."""
+        q = self._normalize(query_embedding)
+
+        with self._lock:
+            slot, sim = self._nearest(q)
+            if slot < 0 or sim < self.threshold:
+                return None
+
+            cached_k, results = self._entries[slot]
+            # Results for a smaller top_k can't answer a larger one
+            if cached_k < top_k:
+                return None
+
+            self._entries.move_to_end(slot)
+            return results[:top_k]
+
+    def put(
+        self,
+        query_embedding: np.ndarray,
+        top_k: int,
+        results: List[SearchResult],
+        generation: Optional[int] = None,
+    ) -> None:
+        """
+        Cache `results` for this query.
+
+        Pass the `generation` read before searching; if the cache was cleared in the
+        meantime (new images ingested), the results may be stale and are not stored.
+        """
+        q = self._normalize(query_embedding)
+
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return
+
+            if self._embs is None:
+                self._embs = np.empty((self.max_entries, q.shape[0]), dtype=np.float32)
+
+            slot, sim = self._nearest(q)
+            if slot < 0 or sim < self.threshold:
+                if len(self._entries) < self.max_entries:
+                    slot = len(self._entries)
+                else:
+                    # Evict the least recently used entry and take over its slot
+                    slot, _ = self._entries.popitem(last=False)
+
+            self._embs[slot] = q
+            self._entries[slot] = (top_k, results)
+            self._entries.move_to_end(slot)
+
+    def clear(self) -> None:
+        """Drop every entry (call whenever the underlying index changes)."""
+        with self._lock:
+            self._entries.clear()
+            self._generation += 1
@@ -5,11 +5,30 @@ Simple in-memory vector store.
 
 Stores (path -> embedding) and supports cosine similarity search.
 Cosine sim becomes dot product after L2 normalization.
+
+Two search modes:
+- "flat": exact brute-force scan (one BLAS matmul over all rows)
+- "hnsw": approximate search over a FAISS HNSW graph, O(log N) per query
+
+Rows are stored as float32, or (quantization="int8") as int8 codes with one float32
+scale per row: 4x fewer bytes to stream through memory on every flat search.
+
+Optional persistence (config.data_dir):
+- embs.f32    row-major float32 matrix, memory-mapped (the OS page cache serves searches,
+              so the corpus doesn't have to fit in process memory)
+              (int8 stores use embs.i8 + scales.f32 instead)
+- paths.jsonl one JSON string per row, appended on every add
+- meta.json   embedding dimension + quantization
+On restart only the paths are read; the matrix is re-mapped, not loaded.
 """
 
+from __future__ import annotations
+
+import json
+import os
 from dataclasses import dataclass
 from threading import Lock
-from typing import List
+from typing import Any, List, Optional, Tuple
 
 import numpy as np
 
@@ -20,44 +39,417 @@ class SearchResult:
     score: float
 
 
+@dataclass
+class VectorStoreConfig:
+    """
+    Configuration for the vector index.
+
+    "flat" is exact and fine up to ~10^5 vectors; switch to "hnsw" for larger corpora.
+    """
+    index_type: str = "flat"
+
+    # HNSW graph parameters (only used when index_type == "hnsw")
+    hnsw_m: int = 32
+    hnsw_ef_construction: int = 200
+    hnsw_ef_search: int = 64
+
+    # Where save() writes the HNSW index. Without a data_dir a sidecar "<index_path>.paths.json"
+    # is written too. If the files exist at startup, the index is restored from them.
+    # Defaults to "<data_dir>/hnsw.faiss" when data_dir is set.
+    index_path: Optional[str] = None
+
+    # Directory for the memory-mapped, persistent store (None = purely in-memory)
+    data_dir: Optional[str] = None
+
+    # Row storage for the flat scan: "none" (float32) or "int8" (per-row symmetric scale).
+    # int8 cuts memory traffic 4x; CLIP rankings are essentially unchanged.
+    quantization: str = "none"
+
+
 class VectorStore:
-    def __init__(self) -> None:
+    # Rows allocated on the first add; capacity doubles whenever the buffer fills up.
+    INITIAL_CAPACITY = 64
+
+    # int8 rows are decoded to float32 this many at a time during a scan, so the decoded
+    # block (1 MB at D=512) stays in L2 instead of materializing an (N, D) float32 copy.
+    SCAN_BLOCK_ROWS = 512
+
+    def __init__(self, config: Optional[VectorStoreConfig] = None) -> None:
+        self.config = config or VectorStoreConfig()
+        if self.config.index_type not in ("flat", "hnsw"):
+            raise ValueError(f"unknown index_type: {self.config.index_type}")
+        if self.config.quantization not in ("none", "int8"):
+            raise ValueError(f"unknown quantization: {self.config.quantization}")
+
         self._paths: List[str] = []
+        # Preallocated (capacity, D) buffer; only the first `_size` rows are valid.
+        # float32 rows, or int8 codes whose per-row scales live in `_scales`.
         self._embs: np.ndarray | None = None
+        self._scales: np.ndarray | None = None
+        self._size = 0
         self._lock = Lock()
 
+        # FAISS HNSW index over the same normalized rows (inner product == cosine).
+        # Created on first add, once the dimension is known.
+        self._index: Any = None
+
+        self._index_path = self.config.index_path
+        if self._index_path is None and self.config.data_dir:
+            self._index_path = os.path.join(self.config.data_dir, "hnsw.faiss")
+
+        if self.config.data_dir:
+            self._open_data_dir()
+        elif self.config.index_type == "hnsw" and self._index_path:
+            self._restore()
+
     def __len__(self) -> int:
-        return len(self._paths)
+        return self._size
+
+    @property
+    def _quantized(self) -> bool:
+        return self.config.quantization == "int8"
+
+    @staticmethod
+    def _as_vector(v: np.ndarray) -> np.ndarray:
+        # float32 everywhere so the search matmul dispatches to BLAS sgemv
+        return np.ascontiguousarray(v, dtype=np.float32).reshape(-1)
 
     @staticmethod
     def _l2_normalize(v: np.ndarray) -> np.ndarray:
-        v = v.astype(np.float32, copy=False)
-        norm = np.linalg.norm(v)
+        """Return v / ||v|| (zero vectors are left as-is)."""
+        norm = np.float32(np.sqrt(v @ v))
         if norm == 0:
-            return v
+            norm = np.float32(1.0)
         return v / norm
 
+    @staticmethod
+    def _l2_normalize_rows(m: np.ndarray) -> np.ndarray:
+        """Normalize every row of `m` in place (zero rows are left as-is) and return it."""
+        # einsum computes all squared norms in one pass, without an (B, D) temporary
+        norms = np.sqrt(np.einsum("ij,ij->i", m, m))
+        m /= np.where(norms == 0, np.float32(1.0), norms)[:, None]
+        return m
+
+    def _data_file(self, name: str) -> str:
+        assert self.config.data_dir is not None
+        return os.path.join(self.config.data_dir, name)
+
+    def _buffer_files(self) -> Tuple[str, Optional[str]]:
+        """File names for the row buffer and (int8 only) the scales buffer."""
+        return ("embs.i8", "scales.f32") if self._quantized else ("embs.f32", None)
+
+    def _buffer(
+        self, name: str, capacity: int, dim: Optional[int], dtype: Any, old: np.ndarray | None = None
+    ) -> np.ndarray:
+        """
+        Allocate a (capacity, dim) buffer, or (capacity,) when dim is None.
+
+        With a data_dir the buffer is a memmap over `name`: growing extends the file and
+        remaps, existing rows stay where they are on disk. In memory, `old` rows are copied
+        over once per doubling (amortized O(1) per add).
+        Readers holding a view of the old buffer keep working; it is never mutated again.
+        """
+        shape = (capacity,) if dim is None else (capacity, dim)
+
+        if self.config.data_dir:
+            path = self._data_file(name)
+            nbytes = int(np.prod(shape)) * np.dtype(dtype).itemsize
+            with open(path, "ab") as f:
+                if f.tell() < nbytes:
+                    # Sparse extension: no bytes are written until rows are filled in
+                    f.truncate(nbytes)
+            return np.memmap(path, dtype=dtype, mode="r+", shape=shape)
+
+        buf = np.empty(shape, dtype=dtype)
+        if old is not None:
+            buf[: old.shape[0]] = old
+        return buf
+
+    def _allocate(self, capacity: int, dim: int) -> None:
+        """(Re)allocate row storage with room for `capacity` rows (caller holds the lock)."""
+        emb_file, scale_file = self._buffer_files()
+        self._embs = self._buffer(
+            emb_file, capacity, dim, np.int8 if self._quantized else np.float32, old=self._embs
+        )
+        if scale_file is not None:
+            self._scales = self._buffer(scale_file, capacity, None, np.float32, old=self._scales)
+
+    def _quantize_into(self, start: int, rows: np.ndarray) -> None:
+        """Store normalized float32 rows as int8 codes + per-row scales."""
+        assert self._embs is not None and self._scales is not None
+        stop = start + rows.shape[0]
+
+        scales = np.abs(rows).max(axis=1) / np.float32(127)
+        scales[scales == 0] = 1.0
+        self._embs[start:stop] = np.rint(rows / scales[:, None])
+        self._scales[start:stop] = scales
+
+    def _decode(self, stop: int) -> np.ndarray:
+        """First `stop` rows as float32 (used to rebuild the HNSW graph)."""
+        assert self._embs is not None
+        if self._scales is None:
+            return np.ascontiguousarray(self._embs[:stop])
+        return self._embs[:stop].astype(np.float32) * self._scales[:stop, None]
+
+    def _open_data_dir(self) -> None:
+        """Reattach to a persisted store (or prepare an empty data_dir)."""
+        os.makedirs(self.config.data_dir, exist_ok=True)
+
+        meta_path = self._data_file("meta.json")
+        if not os.path.exists(meta_path):
+            return
+        with open(meta_path) as f:
+            meta = json.load(f)
+        dim = int(meta["dim"])
+
+        quantization = meta.get("quantization", "none")
+        if quantization != self.config.quantization:
+            raise ValueError(
+                f"{self.config.data_dir} holds {quantization} rows, configured for {self.config.quantization}"
+            )
+
+        paths: List[str] = []
+        if os.path.exists(self._data_file("paths.jsonl")):
+            with open(self._data_file("paths.jsonl"), "rb+") as f:
+                committed = 0
+                for line in f:
+                    # A torn final line (crash mid-append) means its row was never committed
+                    if not line.endswith(b"\n"):
+                        break
+                    paths.append(json.loads(line))
+                    committed += len(line)
+                # Cut the torn tail so the next append starts on a clean line
+                f.truncate(committed)
+
+        # The file is preallocated to capacity, so the row count comes from the paths
+        # (a row is only committed once its path line is written)
+        emb_file, _ = self._buffer_files()
+        itemsize = 1 if self._quantized else np.dtype(np.float32).itemsize
+        capacity = os.path.getsize(self._data_file(emb_file)) // (dim * itemsize)
+        paths = paths[:capacity]
+
+        self._allocate(max(capacity, self.INITIAL_CAPACITY), dim)
+        self._paths = paths
+        self._size = len(paths)
+
+        if self.config.index_type == "hnsw":
+            self._restore_hnsw_from_rows()
+
+    def _restore_hnsw_from_rows(self) -> None:
+        """Load the saved HNSW graph if it matches the rows on disk, else rebuild it."""
+        assert self._embs is not None
+
+        if self._index_path and os.path.exists(self._index_path):
+            import faiss
+
+            index = faiss.read_index(self._index_path)
+            if index.ntotal == self._size:
+                index.hnsw.efSearch = self.config.hnsw_ef_search
+                self._index = index
+                return
+
+        # Missing or stale (rows were added after the last save): rebuild from the matrix
+        self._index = self._new_hnsw_index(self._embs.shape[1])
+        if self._size:
+            self._index.add(self._decode(self._size))
+
+    def _reserve(self, dim: int, count: int = 1) -> None:
+        """Make room for `count` more rows (caller holds the lock)."""
+        needed = self._size + count
+        if self._embs is None:
+            if self.config.data_dir:
+                with open(self._data_file("meta.json"), "w") as f:
+                    json.dump({"dim": dim, "quantization": self.config.quantization}, f)
+            capacity = self.INITIAL_CAPACITY
+            while capacity < needed:
+                capacity *= 2
+            self._allocate(capacity, dim)
+            return
+
+        capacity = self._embs.shape[0]
+        if needed <= capacity:
+            return
+
+        while capacity < needed:
+            capacity *= 2
+        self._allocate(capacity, dim)
+
+    def _new_hnsw_index(self, dim: int) -> Any:
+        # Imported lazily so the flat store doesn't pay for loading FAISS
+        import faiss
+
+        index = faiss.IndexHNSWFlat(dim, self.config.hnsw_m, faiss.METRIC_INNER_PRODUCT)
+        index.hnsw.efConstruction = self.config.hnsw_ef_construction
+        index.hnsw.efSearch = self.config.hnsw_ef_search
+        return index
+
     def add(self, path: str, embedding: np.ndarray) -> None:
-        emb = self._l2_normalize(np.asarray(embedding))
+        self.add_many([path], self._as_vector(embedding).reshape(1, -1))
+
+    def add_many(self, paths: List[str], embeddings: np.ndarray) -> None:
+        """
+        Add B rows at once: `embeddings` is (B, D), row i belongs to paths[i].
 
+        Rows are copied into the buffer in one slice assignment and normalized there in a
+        single vectorized pass, so a micro-batch of ingests costs one call, not B.
+        """
+        embs = np.ascontiguousarray(embeddings, dtype=np.float32)
+        if embs.ndim != 2:
+            raise ValueError(f"expected a (B, D) embedding matrix, got shape {embs.shape}")
+        if embs.shape[0] != len(paths):
+            raise ValueError(f"got {len(paths)} paths for {embs.shape[0]} embeddings")
+        if not paths:
+            return
+
+        count, dim = embs.shape
         with self._lock:
-            self._paths.append(path)
-            if self._embs is None:
-                self._embs = emb.reshape(1, -1)
+            if self._embs is not None and dim != self._embs.shape[1]:
+                raise ValueError(f"expected embedding of dim {self._embs.shape[1]}, got {dim}")
+
+            self._reserve(dim, count)
+            start, stop = self._size, self._size + count
+            if self._quantized:
+                # Normalize a private copy; only the int8 codes land in the buffer
+                rows = self._l2_normalize_rows(embs.copy())
+                self._quantize_into(start, rows)
             else:
-                self._embs = np.vstack([self._embs, emb.reshape(1, -1)])
+                # Normalize once at insert time, straight into the buffer rows (no temporary)
+                rows = self._embs[start:stop]
+                rows[...] = embs
+                self._l2_normalize_rows(rows)
+
+            if self.config.index_type == "hnsw":
+                if self._index is None:
+                    self._index = self._new_hnsw_index(dim)
+                # FAISS ids are insertion order, so they line up with self._paths
+                self._index.add(np.ascontiguousarray(rows))
+
+            if self.config.data_dir:
+                # The path lines are the commit record for the rows written above
+                with open(self._data_file("paths.jsonl"), "a") as f:
+                    f.write("".join(json.dumps(path) + "\n" for path in paths))
+
+            self._paths.extend(paths)
+            self._size = stop
 
     def search(self, query_embedding: np.ndarray, top_k: int = 5) -> List[SearchResult]:
-        q = self._l2_normalize(np.asarray(query_embedding))
+        q = self._l2_normalize(self._as_vector(query_embedding))
 
+        if self.config.index_type == "hnsw":
+            return self._search_hnsw(q, top_k)
+
+        # Snapshot the valid rows; the store is append-only, so the view stays consistent
+        # after the lock is released and the matmul doesn't block concurrent adds.
         with self._lock:
-            if self._embs is None or len(self._paths) == 0:
+            if self._embs is None or self._size == 0:
                 return []
+            embs = self._embs[: self._size]
+            scales = None if self._scales is None else self._scales[: self._size]
+            paths = self._paths[: self._size]
+
+        scores = embs @ q if scales is None else self._scan_int8(embs, scales, q)
+        idx = self._top_k(scores, top_k)
+
+        return [SearchResult(path=paths[i], score=float(scores[i])) for i in idx]
+
+    @staticmethod
+    def _top_k(scores: np.ndarray, top_k: int) -> np.ndarray:
+        """Indices of the k best scores, best first, in O(N + k log k)."""
+        n = scores.shape[0]
+        k = max(1, min(int(top_k), n))
 
-            scores = self._embs @ q
-            k = max(1, min(int(top_k), scores.shape[0]))
+        # Asking for everything: a partition pass first would only add work
+        if k == n:
+            return np.argsort(-scores)
 
-            idx = np.argpartition(-scores, kth=k - 1)[:k]
-            idx = idx[np.argsort(-scores[idx])]
+        idx = np.argpartition(-scores, kth=k - 1)[:k]
+        return idx[np.argsort(-scores[idx])]
 
-            return [SearchResult(path=self._paths[i], score=float(scores[i])) for i in idx]
\ No newline at end of file
+    def _scan_int8(self, codes: np.ndarray, scales: np.ndarray, q: np.ndarray) -> np.ndarray:
+        """
+        Cosine scores against int8 rows: score_i = scale_i * (codes_i . q).
+
+        The query stays float32 (asymmetric distance), which keeps recall close to the
+        float32 store; only the stored side is quantized.
+        """
+        scores = np.empty(codes.shape[0], dtype=np.float32)
+        for start in range(0, codes.shape[0], self.SCAN_BLOCK_ROWS):
+            stop = start + self.SCAN_BLOCK_ROWS
+            np.matmul(codes[start:stop].astype(np.float32), q, out=scores[start:stop])
+        scores *= scales
+        return scores
+
+    def _search_hnsw(self, q: np.ndarray, top_k: int) -> List[SearchResult]:
+        # FAISS indexes must not be searched while another thread adds to them
+        with self._lock:
+            if self._index is None or self._size == 0:
+                return []
+            k = max(1, min(int(top_k), self._size))
+            scores, ids = self._index.search(q.reshape(1, -1), k)
+            paths = self._paths
+
+            # HNSW may return fewer than k hits; missing slots come back as id -1
+            return [
+                SearchResult(path=paths[i], score=float(score))
+                for score, i in zip(scores[0], ids[0])
+                if i >= 0
+            ]
+
+    def save(self) -> None:
+        """
+        Flush the memory-mapped rows (data_dir) and write the HNSW index to its index path.
+
+        Without a data_dir, the row -> path mapping is saved next to the HNSW index.
+        No-op for a purely in-memory flat store.
+        """
+        with self._lock:
+            for buf in (self._embs, self._scales):
+                if isinstance(buf, np.memmap):
+                    buf.flush()
+
+            if self.config.index_type != "hnsw" or not self._index_path or self._index is None:
+                return
+
+            import faiss
+
+            index_path = self._index_path
+            tmp_path = index_path + ".tmp"
+
+            # Write-then-rename so a crash mid-write never leaves a truncated index behind
+            faiss.write_index(self._index, tmp_path)
+            if not self.config.data_dir:
+                with open(index_path + ".paths.json.tmp", "w") as f:
+                    json.dump(self._paths, f)
+                os.replace(index_path + ".paths.json.tmp", index_path + ".paths.json")
+            os.replace(tmp_path, index_path)
+
+    def _restore(self) -> None:
+        """Load a previously saved HNSW index, if one exists."""
+        index_path = self._index_path
+        assert index_path is not None
+        if not (os.path.exists(index_path) and os.path.exists(index_path + ".paths.json")):
+            return
+
+        import faiss
+
+        index = faiss.read_index(index_path)
+        index.hnsw.efSearch = self.config.hnsw_ef_search
+        with open(index_path + ".paths.json") as f:
+            paths = json.load(f)
+
+        if index.ntotal != len(paths):
+            raise ValueError(f"{index_path} holds {index.ntotal} vectors but {len(paths)} paths")
+
+        self._index = index
+        self._paths = list(paths)
+        self._size = len(paths)
+
+        # Rebuild the flat buffer from the stored vectors so len()/dim checks keep working
+        self._allocate(max(self.INITIAL_CAPACITY, self._size), index.d)
+        if self._size:
+            rows = index.reconstruct_n(0, self._size)
+            if self._quantized:
+                self._quantize_into(0, rows)
+            else:
+                assert self._embs is not None
+                self._embs[: self._size] = rows